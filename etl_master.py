@@ -1,15 +1,28 @@
+import os
+import sys
+
+# Fail fast on missing configuration, before the heavy geospatial imports below
+if __name__ == "__main__" and not os.environ.get("POLICE_DATA_URL"):
+    print("❌ Error: POLICE_DATA_URL environment variable is missing. Please set it in GitHub Secrets.")
+    sys.exit(1)
+
+import numpy as np
 import pandas as pd
 import geopandas as gpd
+import shapely
+import pyogrio
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import requests
 import io
-import os
-import json
+import orjson
 from datetime import datetime
 import re
-from time import sleep 
+import time
 from urllib.parse import urlencode 
-import sys 
-from shapely.geometry import Point
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 # --- 1. Configuration ---
@@ -25,34 +38,186 @@ OUTPUT_DIR = 'data'
 OUTPUT_FILE = os.path.join(OUTPUT_DIR, 'route_crime_stats.geojson')
 STATS_OUTPUT_FILE = os.path.join(OUTPUT_DIR, 'crime_breakdown.json')
 
+# Local cache for slow-changing ArcGIS layers (kept out of OUTPUT_DIR, which is published)
+CACHE_DIR = 'cache'
+MESHBLOCK_CACHE_FILE = os.path.join(CACHE_DIR, 'meshblocks.parquet')
+STOPS_CACHE_FILE = os.path.join(CACHE_DIR, 'bus_stops.parquet')
+CACHE_MAX_AGE_S = 30 * 24 * 3600 # Meshblock boundaries change on a multi-year cadence
+STOPS_CACHE_MAX_AGE_S = 24 * 3600 # Stops follow timetable changes; also revalidated against the layer's last edit
+
 # Max records per ArcGIS request for stability
 MAX_RECORDS = 500 
-TARGET_CRS = "EPSG:2193" # NZTM2000 for metric spatial operations
+# Concurrent ArcGIS page requests (kept modest to respect service limits)
+MAX_WORKERS = 8
+# Seconds to wait for a connection, then between bytes, before a request fails (and is retried).
+# The connect limit is short so an unreachable host is retried quickly instead of stalling a worker.
+REQUEST_TIMEOUT_S = (5, 30)
+# Bytes per crime CSV block; only Auckland rows from each block are kept in memory
+CRIME_CSV_BLOCK_SIZE = 64 << 20
+TARGET_EPSG = 2193
+TARGET_CRS = f"EPSG:{TARGET_EPSG}" # NZTM2000 for metric spatial operations
 
 
 # --- 2. Helper Functions ---
 
+# Runs of non-word characters: dropped if pure punctuation, collapsed to one space if they contain whitespace.
+# One pass gives the same result as stripping punctuation and then collapsing whitespace.
+_TA_NON_WORD_RE = re.compile(r'\W+', re.UNICODE)
+
+def _ta_non_word_sub(match: re.Match) -> str:
+    return ' ' if any(ch.isspace() for ch in match.group()) else ''
+
 def clean_territorial_authority(name: str) -> str:
     """Cleans up the territorial authority name."""
     if pd.isna(name): return ''
-    cleaned = re.sub(r'[^\w\s]', '', str(name), flags=re.UNICODE) 
-    cleaned = re.sub(r'\s+', ' ', cleaned).strip() 
-    return cleaned.upper()
+    return _TA_NON_WORD_RE.sub(_ta_non_word_sub, str(name)).strip().upper()
 
 AUCKLAND_AUTHORITIES_CLEANED = [clean_territorial_authority(name) for name in AUCKLAND_AUTHORITIES]
 
+# Keeps Arrow string columns Arrow-backed when converting record batches to pandas
+ARROW_STRING_TYPES = {pa.string(): pd.StringDtype('pyarrow')}
+
+
+def parse_repeated_dates(values: pd.Series, date_format: str) -> pd.Series:
+    """Parses a low-cardinality date column by parsing each distinct string once and mapping back."""
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(uniques, format=date_format, errors='coerce')
+    # Missing values were factorized to -1 and come back as NaT
+    return pd.Series(parsed.take(codes, allow_fill=True, fill_value=pd.NaT), index=values.index)
+
+
+def bounds_overlap(geoms, box) -> np.ndarray:
+    """Boolean mask of geometries whose envelope overlaps box (minx, miny, maxx, maxy); no GEOS predicate is run."""
+    minx, miny, maxx, maxy = box
+    bounds = shapely.bounds(geoms)
+    return (bounds[:, 0] <= maxx) & (bounds[:, 2] >= minx) & (bounds[:, 1] <= maxy) & (bounds[:, 3] >= miny)
+
+
+def create_http_session() -> requests.Session:
+    """Creates a pooled HTTP session that retries throttled or failed requests with backoff."""
+    retry = Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=16, max_retries=retry))
+    session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+    return session
+
+# Shared by every download so TCP/TLS connections are reused across stages and ArcGIS pages
+HTTP_SESSION = create_http_session()
+
+
+class ResponseBodyReader(io.RawIOBase):
+    """Raw binary file over a streamed HTTP response body, decoding any gzip transfer.
+    
+    urllib3's response object reports itself closed as soon as the body is drained, which readers
+    such as pyarrow treat as an error; this view stays open until it is closed explicitly.
+    """
+    def __init__(self, response: requests.Response):
+        self._body = response.raw
+        self._body.decode_content = True
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._body.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def open_streamed_download(response: requests.Response) -> io.BufferedReader:
+    """Wraps a streamed HTTP response body as a buffered binary file."""
+    return io.BufferedReader(ResponseBodyReader(response), buffer_size=1 << 20)
+
+
+def fetch_arcgis_count(base_url: str) -> int:
+    """Asks an ArcGIS layer for its total record count without fetching any features."""
+    count_url = f"{base_url}/query?where=1%3D1&returnCountOnly=true&f=json"
+    count_response = HTTP_SESSION.get(count_url, timeout=REQUEST_TIMEOUT_S)
+    count_response.raise_for_status()
+    return count_response.json().get('count', 0)
+
+
+def fetch_arcgis_max_record_count(base_url: str) -> int | None:
+    """Returns the most records the layer sends per query, or None if the service does not publish it."""
+    info_response = HTTP_SESSION.get(f"{base_url}?f=json", timeout=REQUEST_TIMEOUT_S)
+    info_response.raise_for_status()
+    return orjson.loads(info_response.content).get('maxRecordCount') or None
 
-def fetch_arcgis_geometry(base_url: str, id_field: str, out_fields: list, mode='geojson') -> gpd.GeoDataFrame:
-    """Generic function to fetch geometry data from ArcGIS REST service using pagination."""
+
+def fetch_arcgis_last_edit(base_url: str) -> float | None:
+    """Returns when the layer's data was last edited (epoch seconds), or None if the service does not publish it."""
+    info_response = HTTP_SESSION.get(f"{base_url}?f=json", timeout=REQUEST_TIMEOUT_S)
+    info_response.raise_for_status()
+    editing_info = orjson.loads(info_response.content).get('editingInfo') or {}
+    last_edit_ms = editing_info.get('dataLastEditDate') or editing_info.get('lastEditDate')
+    return last_edit_ms / 1000 if last_edit_ms else None
+
+
+def load_cached_geometry(cache_file: str, base_url: str, max_age_s: float = CACHE_MAX_AGE_S) -> gpd.GeoDataFrame | None:
+    """Returns the cached GeoDataFrame if it is fresh and the service reports no changes since it was written, else None."""
+    if not os.path.exists(cache_file):
+        return None
+    cached_at = os.path.getmtime(cache_file)
+    age_s = time.time() - cached_at
+    if age_s > max_age_s:
+        print(f"   -> Cache {cache_file} is {age_s / 86400:.0f} days old; refetching.")
+        return None
+    
+    try:
+        gdf_cached = gpd.read_parquet(cache_file)
+    except Exception as e:
+        print(f"⚠️ Warning: Could not read {cache_file} ({e}); refetching.")
+        return None
+    
+    # Each probe is checked on its own, so one failing request does not skip the other's check
+    try:
+        total_count = fetch_arcgis_count(base_url)
+    except Exception as e:
+        print(f"⚠️ Warning: Could not check the record count of {cache_file} against the service ({e}).")
+    else:
+        if total_count != len(gdf_cached):
+            print(f"   -> Cache {cache_file} has {len(gdf_cached)} records but service reports {total_count}; refetching.")
+            return None
+    
+    try:
+        last_edit = fetch_arcgis_last_edit(base_url)
+    except Exception as e:
+        print(f"⚠️ Warning: Could not check the last edit of {cache_file} against the service ({e}).")
+        last_edit = None
+    # The layer's last-edit stamp plays the role of an ETag: any edit after the cache was written invalidates it
+    if last_edit is not None and last_edit > cached_at:
+        print(f"   -> Service data changed since {cache_file} was written; refetching.")
+        return None
+    return gdf_cached
+
+
+def save_cached_geometry(gdf: gpd.GeoDataFrame, cache_file: str) -> None:
+    """Writes fetched geometry to the local GeoParquet cache.
+    
+    The file is written next to the cache and then renamed over it, so an interrupted write never
+    leaves a truncated cache behind.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_file = f"{cache_file}.tmp"
+    try:
+        gdf.to_parquet(tmp_file, index=False)
+        os.replace(tmp_file, cache_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def fetch_arcgis_geometry(base_url: str, id_field: str, out_fields: list, mode='geojson', out_sr: int = 4326) -> gpd.GeoDataFrame:
+    """Generic function to fetch geometry data from ArcGIS REST service using pagination.
+    
+    out_sr is the EPSG code the service should project the geometry to before sending it.
+    """
     print(f"   -> Fetching {id_field} geometry with pagination...")
     
     out_fields_str = ','.join(out_fields)
-    count_url = f"{base_url}/query?where=1%3D1&returnCountOnly=true&f=json"
     
     try:
-        count_response = requests.get(count_url)
-        count_response.raise_for_status()
-        total_count = count_response.json().get('count', 0)
+        total_count = fetch_arcgis_count(base_url)
         print(f"   -> Service reports total records: {total_count}")
         if total_count == 0:
             print(f"❌ Error: ArcGIS service reported zero records for {id_field}.")
@@ -61,63 +226,95 @@ def fetch_arcgis_geometry(base_url: str, id_field: str, out_fields: list, mode='
         print(f"❌ Failed to get total count for {id_field}: {e}")
         return gpd.GeoDataFrame()
 
-    all_geometry = []
-    offset = 0
-    
-    while offset < total_count:
-        print(f"   -> Fetching batch: records {offset} to {min(offset + MAX_RECORDS, total_count)}...")
+    # The server silently truncates pages above its own maxRecordCount, so never ask for more than that
+    try:
+        page_size = min(MAX_RECORDS, fetch_arcgis_max_record_count(base_url) or MAX_RECORDS)
+    except Exception as e:
+        print(f"⚠️ Warning: Could not read the {id_field} layer's page limit ({e}); using {MAX_RECORDS}.")
+        page_size = MAX_RECORDS
+
+    def fetch_page(offset: int, record_count: int):
+        """Fetches and parses a single page; returns None if the page failed or was empty."""
+        print(f"   -> Fetching batch: records {offset} to {offset + record_count}...")
         
         query_params = {
             'where': '1=1',
             'outFields': out_fields_str,
             'resultOffset': offset,
-            'resultRecordCount': MAX_RECORDS,
+            'resultRecordCount': record_count,
             'f': mode,
             'inSR': '4326', 
-            'outSR': '4326',
+            'outSR': str(out_sr),
         }
         
         query_url = f"{base_url}/query?{urlencode(query_params)}"
         
         try:
-            response = requests.get(query_url)
+            response = HTTP_SESSION.get(query_url, timeout=REQUEST_TIMEOUT_S)
             response.raise_for_status()
             
             # --- BUS STOP CRS FIX: Handle NZTM2000 X/Y coordinates from JSON service ---
             if mode == 'json' and 'BusService/FeatureServer/0' in base_url:
-                data = response.json()
+                data = orjson.loads(response.content)
                 features = data.get('features', [])
                 if not features:
-                    print("   -> 🚨 Warning: ArcGIS service returned an empty batch (JSON). Stopping fetch.")
-                    break
+                    print(f"   -> 🚨 Warning: ArcGIS service returned an empty batch (JSON, Offset: {offset}).")
+                    return None
                     
-                df_batch = pd.DataFrame([f['attributes'] for f in features])
+                # Gather attributes column-wise (SoA): pandas takes ready-made columns instead of
+                # aligning keys across one dict per record
+                attributes = [f['attributes'] for f in features]
+                df_batch = pd.DataFrame({name: [a.get(name) for a in attributes] for name in attributes[0]})
                 
-                # Bus stop coordinates are in NZTM2000 (EPSG:2193)
-                geometry = [Point(f['geometry']['x'], f['geometry']['y']) for f in features]
-                gdf_batch = gpd.GeoDataFrame(df_batch, geometry=geometry, crs="EPSG:2193") 
+                # Bus stop coordinates are in NZTM2000 (EPSG:2193); points_from_xy builds them in one vectorized call
+                # (coordinates are read straight into float64 arrays, without intermediate lists)
+                xs = np.fromiter((f['geometry']['x'] for f in features), dtype=np.float64, count=len(features))
+                ys = np.fromiter((f['geometry']['y'] for f in features), dtype=np.float64, count=len(features))
+                geometry = gpd.points_from_xy(xs, ys, crs="EPSG:2193")
+                return gpd.GeoDataFrame(df_batch, geometry=geometry)
                 
-            # --- Standard GeoJSON (Routes and Meshblocks) ---
-            else: 
-                gdf_batch = gpd.read_file(io.BytesIO(response.content))
-                
-                if gdf_batch.empty:
-                    print("   -> 🚨 Warning: ArcGIS service returned an empty batch (GeoJSON). Stopping fetch.")
-                    break
-                
-            all_geometry.append(gdf_batch)
-            offset += len(gdf_batch)
-            sleep(0.5) 
+            # --- GeoJSON or Esri JSON (Meshblocks) ---
+            # pyogrio detects the format and decodes the batch through GDAL/Arrow in C rather than per-feature Python objects
+            gdf_batch = pyogrio.read_dataframe(io.BytesIO(response.content), use_arrow=True)
+            
+            if gdf_batch.empty:
+                print(f"   -> 🚨 Warning: ArcGIS service returned an empty batch ({mode}, Offset: {offset}).")
+                return None
+            return gdf_batch
             
         except Exception as e:
             print(f"❌ Failed to fetch batch data (Offset: {offset}): {e}")
-            break
+            return None
+
+    def fetch_batch(offset: int):
+        """Fetches the records of one page slot, following up on short pages; returns None if nothing came back."""
+        # Size the last page to exactly the remaining records instead of asking for a full page
+        record_count = min(page_size, total_count - offset)
+        pages = []
+        received = 0
+        while received < record_count:
+            gdf_page = fetch_page(offset + received, record_count - received)
+            if gdf_page is None:
+                break
+            pages.append(gdf_page)
+            received += len(gdf_page)
+        if received < record_count:
+            print(f"❌ Error: Only {received} of {record_count} {id_field} records came back from offset {offset}.")
+        return pd.concat(pages, ignore_index=True) if pages else None
+
+    # All offsets are known from the count probe, so pages are requested concurrently.
+    # executor.map yields results in offset order, keeping the concatenated output stable.
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        batches = executor.map(fetch_batch, range(0, total_count, page_size))
+        all_geometry = [gdf_batch for gdf_batch in batches if gdf_batch is not None]
             
     if not all_geometry:
         print(f"❌ Error: Failed to retrieve any {id_field} data.")
         return gpd.GeoDataFrame()
         
     gdf_final = pd.concat(all_geometry, ignore_index=True)
+    if len(gdf_final) != total_count:
+        print(f"❌ Error: Retrieved {len(gdf_final)} {id_field} records but the service reports {total_count}; results will be incomplete.")
     
     # Ensure all required fields are present (case-insensitive column check)
     out_fields_upper = [col.upper() for col in out_fields]
@@ -136,44 +333,117 @@ def fetch_arcgis_geometry(base_url: str, id_field: str, out_fields: list, mode='
         if geom_name not in final_cols:
             final_cols.append(geom_name)
     
-    # Use a set to maintain uniqueness and then convert back to a list
-    return gdf_final[list(set(final_cols))].copy()
+    # dict.fromkeys drops duplicate names while keeping the requested column order
+    return gdf_final[list(dict.fromkeys(final_cols))]
 
 def fetch_all_meshblock_geometry(base_url: str) -> gpd.GeoDataFrame:
-    """Fetches Meshblock Polygon geometry."""
-    gdf_final = fetch_arcgis_geometry(base_url, 'MB_number', ['MB_number'])
+    """Fetches Meshblock Polygon geometry, reusing the local Parquet cache when it is fresh."""
+    gdf_cached = load_cached_geometry(MESHBLOCK_CACHE_FILE, base_url)
+    if gdf_cached is not None:
+        print(f"✅ Loaded Meshblock geometry records from cache: {len(gdf_cached)}")
+        return gdf_cached
+    
+    # Esri JSON (f=json) is a denser payload than f=geojson; GDAL's ESRIJSON driver decodes it directly.
+    # The service projects the polygons to TARGET_CRS server-side, so PROJ never runs over them here.
+    gdf_final = fetch_arcgis_geometry(base_url, 'MB_number', ['MB_number'], mode='json', out_sr=TARGET_EPSG)
     if not gdf_final.empty:
         # Standardize Meshblock ID to 7-digit string
         gdf_final['MB_number'] = gdf_final['MB_number'].astype(str).str.strip().str.zfill(7)
+        # Esri JSON pages without a spatialReference come back CRS-less; label them with the requested outSR
+        if gdf_final.crs is None:
+            gdf_final = gdf_final.set_crs(TARGET_CRS)
         print(f"✅ Successfully fetched total Meshblock geometry records: {len(gdf_final)}")
+        
+        save_cached_geometry(gdf_final, MESHBLOCK_CACHE_FILE)
     return gdf_final
 
-def fetch_and_clean_police_data(crime_url: str, meshblock_url: str) -> gpd.GeoDataFrame:
-    """Downloads, merges, and filters crime data using Meshblock Polygon geometry."""
+def fetch_and_clean_police_data(crime_url: str, meshblock_url: str) -> tuple[pd.DataFrame, gpd.GeoDataFrame]:
+    """Downloads and filters crime data, keeping records whose Meshblock has Polygon geometry.
+    
+    Returns the crime attributes (keyed by 'Meshblock', no geometry) and the Meshblock polygons.
+    """
     print("--- 1. Processing Police Data ---")
     
+    # The Meshblock polygons come from an independent service: page them in while the CSV streams
+    geometry_executor = ThreadPoolExecutor(max_workers=1)
+    meshblock_future = geometry_executor.submit(fetch_all_meshblock_geometry, meshblock_url)
+    geometry_executor.shutdown(wait=False)
+    
     # ----------------------------------------------------
     # 1. Data Download and Initial Cleaning
     # ----------------------------------------------------
     print("   -> Downloading large crime data file...")
+    CRIME_MONTH_COL_NAME = 'Year Month'
     try:
-        crime_data_response = requests.get(crime_url)
-        crime_data_response.raise_for_status()
-        df_crime = pd.read_csv(io.BytesIO(crime_data_response.content), encoding='latin1')
-        
-        df_crime.columns = df_crime.columns.str.strip()
-        df_crime.columns = [col.replace('ï»¿', '').strip() for col in df_crime.columns]
-        
-        CRIME_MONTH_COL_NAME = 'Year Month'
-        if CRIME_MONTH_COL_NAME not in df_crime.columns: raise KeyError(f"Required '{CRIME_MONTH_COL_NAME}' column not found.")
-            
-        meshblock_cols = [col for col in df_crime.columns if 'meshblock' in col.lower()]
-        if 'Meshblock' not in df_crime.columns and meshblock_cols:
-            df_crime.rename(columns={meshblock_cols[0]: 'Meshblock'}, inplace=True)
-        elif 'Meshblock' not in df_crime.columns:
-            raise KeyError(f"Required 'Meshblock' column not found.")
+        # Parse straight off the socket: blocks are filtered while later ones are still downloading
+        with HTTP_SESSION.get(crime_url, stream=True, timeout=REQUEST_TIMEOUT_S) as response:
+            response.raise_for_status()
+            with open_streamed_download(response) as crime_csv:
+                # Consume the header line only, so column names can be normalized before the batched read
+                raw_columns = pd.read_csv(io.BytesIO(crime_csv.readline()), encoding='latin1', nrows=0).columns
+                column_map = {col: col.strip().replace('ï»¿', '').strip() for col in raw_columns}
+                
+                if CRIME_MONTH_COL_NAME not in column_map.values(): raise KeyError(f"Required '{CRIME_MONTH_COL_NAME}' column not found.")
+                    
+                meshblock_cols = [raw for raw, col in column_map.items() if 'meshblock' in col.lower()]
+                if 'Meshblock' not in column_map.values() and meshblock_cols:
+                    column_map[meshblock_cols[0]] = 'Meshblock'
+                elif 'Meshblock' not in column_map.values():
+                    raise KeyError(f"Required 'Meshblock' column not found.")
+                
+                # Only parse the columns the analysis uses, as strings (no numeric inference on IDs)
+                required_cols = [CRIME_MONTH_COL_NAME, 'Meshblock', 'Territorial Authority', 'ANZSOC Division']
+                usecols = [raw for raw, col in column_map.items() if col in required_cols]
+                
+                # Stream record batches through pyarrow's CSV reader (C++ tokenizer, strings kept in Arrow
+                # buffers) and keep only Auckland rows, so the full national table is never in memory.
+                # The authority name repeats on every row, so it is dictionary-encoded (a pandas categorical).
+                column_types = {
+                    raw: pa.dictionary(pa.int32(), pa.string()) if column_map[raw] == 'Territorial Authority' else pa.string()
+                    for raw in usecols
+                }
+                # pyarrow rejects rows with the wrong number of fields; skip and count them instead of failing the run
+                skipped_rows = 0
+                def skip_invalid_row(row) -> str:
+                    nonlocal skipped_rows
+                    skipped_rows += 1
+                    return 'skip'
+                
+                # A header-only body has nothing for pyarrow to parse ("Empty CSV file"), so it yields no blocks
+                reader = pacsv.open_csv(
+                    crime_csv,
+                    read_options=pacsv.ReadOptions(column_names=list(raw_columns), encoding='latin1', block_size=CRIME_CSV_BLOCK_SIZE),
+                    parse_options=pacsv.ParseOptions(invalid_row_handler=skip_invalid_row),
+                    convert_options=pacsv.ConvertOptions(include_columns=usecols, column_types=column_types, strings_can_be_null=True),
+                ) if crime_csv.peek(1) else []
+                raw_count = 0
+                auckland_chunks = []
+                for batch in reader:
+                    chunk = batch.to_pandas(types_mapper=ARROW_STRING_TYPES.get).rename(columns=column_map)
+                    raw_count += len(chunk)
+                    
+                    # Filter for Auckland: clean each distinct name once, then test rows by category code.
+                    # A trailing False lets missing names (code -1) index straight into the mask.
+                    ta = chunk.pop('Territorial Authority')
+                    ta_codes = ta.cat.codes.to_numpy()
+                    ta_cleaned = pd.Series(ta.cat.categories).map(clean_territorial_authority).to_numpy()
+                    is_auckland = np.append(np.isin(ta_cleaned, AUCKLAND_AUTHORITIES_CLEANED), False)[ta_codes]
+                    auckland_chunks.append(chunk[is_auckland].assign(**{
+                        'Territorial Authority Cleaned': ta_cleaned[ta_codes[is_auckland]]
+                    }))
         
-        print(f"   -> Raw crime data records: {len(df_crime)}") 
+        if auckland_chunks:
+            df_auckland = pd.concat(auckland_chunks, ignore_index=True)
+        else:
+            # No rows at all: keep the columns a filtered block would have, so later steps see an empty table
+            kept_cols = [column_map[raw] for raw in usecols if column_map[raw] != 'Territorial Authority']
+            df_auckland = pd.DataFrame(columns=kept_cols + ['Territorial Authority Cleaned'])
+        # The per-block frames would otherwise stay alive next to their concatenated copy
+        del auckland_chunks
+        if skipped_rows:
+            print(f"⚠️ Warning: Skipped {skipped_rows} malformed crime data rows (wrong number of fields).")
+        print(f"   -> Raw crime data records: {raw_count}") 
+        print(f"   -> Auckland filtered records: {len(df_auckland)}")
         
     except Exception as e:
         print(f"❌ Failed to download or process crime data: {e}")
@@ -182,63 +452,39 @@ def fetch_and_clean_police_data(crime_url: str, meshblock_url: str) -> gpd.GeoDa
     # ----------------------------------------------------
     # 2. Fetch Geometry Data (Polygons Only)
     # ----------------------------------------------------
-    gdf_meshblocks = fetch_all_meshblock_geometry(meshblock_url)
+    gdf_meshblocks = meshblock_future.result()
     
     if gdf_meshblocks.empty:
-        return gpd.GeoDataFrame()
-        
-    # **FINAL ATTEMPT FIX**: Ensure Meshblock geometry column is consistently available as 'geometry' 
-    # and rename it for the merge operation to prevent column name clashes.
-    MESHBLOCK_GEOM_NAME = 'geometry_mb_source_temp'
-    if 'geometry' in gdf_meshblocks.columns:
-        gdf_meshblocks = gdf_meshblocks.rename(columns={'geometry': MESHBLOCK_GEOM_NAME})
-    elif gdf_meshblocks.geometry.name in gdf_meshblocks.columns:
-        # Fallback using the active geometry name
-        gdf_meshblocks = gdf_meshblocks.rename(columns={gdf_meshblocks.geometry.name: MESHBLOCK_GEOM_NAME})
-    else:
-        # Critical failure to find geometry column
-        raise KeyError("Meshblock geometry column not found in GeoDataFrame after fetch.")
+        return pd.DataFrame(), gdf_meshblocks
 
-
-    # Standardize Police data Meshblock ID (7-digit string)
-    df_crime['Meshblock'] = df_crime['Meshblock'].astype(str).str.strip().str.zfill(7)
+    # Standardize Police data Meshblock ID (7-digit string): parse numbers in one C pass, then
+    # zero-pad only the distinct values as category labels. Non-numeric IDs become missing, and so do
+    # fractional or infinite ones ('1234.5' would otherwise share the label '0001234'; 'inf' has none).
+    mb_numbers = pd.to_numeric(df_auckland['Meshblock'], errors='coerce')
+    mb_numbers = pd.Categorical(mb_numbers.where(np.isfinite(mb_numbers) & (mb_numbers % 1 == 0)))
+    df_auckland['Meshblock'] = mb_numbers.rename_categories(lambda mb: f"{int(mb):07d}")
     
-    # Filter for Auckland
-    df_crime['Territorial Authority Cleaned'] = df_crime['Territorial Authority'].astype(str).apply(clean_territorial_authority)
-    df_auckland = df_crime[df_crime['Territorial Authority Cleaned'].isin(AUCKLAND_AUTHORITIES_CLEANED)].copy()
-    print(f"   -> Auckland filtered records: {len(df_auckland)}")
+    # Low-cardinality strings repeated per incident: categoricals let lookups and groupbys work on int codes
+    for col in ('Meshblock', 'Territorial Authority Cleaned', 'ANZSOC Division'):
+        if col in df_auckland.columns:
+            df_auckland[col] = df_auckland[col].astype('category')
     
     # ----------------------------------------------------
-    # 3. Merge: Meshblock Polygon Match
+    # 3. Match: Meshblock Polygon Availability
     # ----------------------------------------------------
-    print("   -> Executing Merge: Meshblock Polygon geometry match...")
+    # Crime rows only carry the Meshblock ID; polygons stay in gdf_meshblocks (one per Meshblock)
+    # and are attached to the unique Meshblocks in analyze_and_aggregate.
+    print("   -> Executing Match: Meshblock Polygon geometry lookup...")
 
-    df_merged = df_auckland.merge(
-        gdf_meshblocks[['MB_number', MESHBLOCK_GEOM_NAME]], 
-        left_on='Meshblock', 
-        right_on='MB_number', 
-        how='left'
-    )
-    # RENAME the source geometry column to the final expected name 'geometry'
-    df_merged = df_merged.rename(columns={MESHBLOCK_GEOM_NAME: 'geometry'}) 
-    
-    unmatched_count = df_merged['geometry'].isna().sum()
-    print(f"   -> Successfully matched records (Polygons): {len(df_merged) - unmatched_count}")
+    # Categorical isin tests each Meshblock category once and expands by code
+    has_polygon = df_auckland['Meshblock'].isin(gdf_meshblocks['MB_number'])
+    print(f"   -> Successfully matched records (Polygons): {int(has_polygon.sum())}")
     
     # ----------------------------------------------------
-    # 4. Data Cleaning and Final GeoDataFrame Creation
+    # 4. Data Cleaning and Final DataFrame Creation
     # ----------------------------------------------------
     
-    # CRITICAL FIX: Explicitly parse date format D/M/YYYY
-    df_merged[CRIME_MONTH_COL_NAME] = pd.to_datetime(
-        df_merged[CRIME_MONTH_COL_NAME], 
-        format='%d/%m/%Y',  
-        errors='coerce' 
-    )
-    
-    df_final = df_merged.copy()
-
-    df_final = df_final.rename(columns={
+    df_final = df_auckland.rename(columns={
         'ANZSOC Division': 'OffenceType',     
         'Territorial Authority Cleaned': 'PoliceDistrict', 
         CRIME_MONTH_COL_NAME: 'CrimeMonth',
@@ -246,20 +492,18 @@ def fetch_and_clean_police_data(crime_url: str, meshblock_url: str) -> gpd.GeoDa
     
     # Drop records that have no Polygon geometry
     initial_valid_count = len(df_final)
-    df_final.dropna(subset=['geometry'], inplace=True) 
+    df_final = df_final[has_polygon]
+    del df_auckland, has_polygon # the unfiltered columns are no longer needed
+    
+    # CRITICAL FIX: Explicitly parse date format D/M/YYYY (only on the rows that reach analysis)
+    df_final['CrimeMonth'] = parse_repeated_dates(df_final['CrimeMonth'], '%d/%m/%Y')
     
     print(f"✅ Police data processing complete. Final records (with Polygon geometry) for analysis: {len(df_final)}.")
     if len(df_final) < initial_valid_count:
         print(f"⚠️ Note: {initial_valid_count - len(df_final)} records dropped due to lack of Meshblock Polygon geometry.")
     
-    gdf_crime = gpd.GeoDataFrame(
-        df_final,
-        geometry='geometry', 
-        crs="EPSG:4326"
-    )
-    
-    final_cols = ['OffenceType', 'PoliceDistrict', 'CrimeMonth', 'geometry', 'Meshblock']
-    return gdf_crime[[col for col in final_cols if col in gdf_crime.columns]]
+    final_cols = ['OffenceType', 'PoliceDistrict', 'CrimeMonth', 'Meshblock']
+    return df_final[[col for col in final_cols if col in df_final.columns]], gdf_meshblocks
 
 
 # --- 3. Fetch Route Geometry ---
@@ -268,14 +512,20 @@ def fetch_route_geometry() -> gpd.GeoDataFrame:
     """Fetches bus route geometry (LineString)."""
     print("--- 2. Fetching AT Route Geometry (LineString) ---")
     try:
-        route_response = requests.get(ARCGIS_ROUTES_URL)
+        route_response = HTTP_SESSION.get(ARCGIS_ROUTES_URL, timeout=REQUEST_TIMEOUT_S)
         route_response.raise_for_status() 
-        gdf_routes = gpd.read_file(io.BytesIO(route_response.content))
         
-        gdf_routes.rename(columns={'ROUTENUMBER': 'Route No'}, inplace=True) 
-        gdf_routes = gdf_routes[gdf_routes['MODE'] == 'Bus'].copy()
-        gdf_routes = gdf_routes[['Route No', 'geometry']].copy()
-        gdf_routes['Route No'] = gdf_routes['Route No'].astype(str)
+        # Filter to Bus features on the raw JSON so geometries are only built for routes that are kept
+        route_features = orjson.loads(route_response.content).get('features', [])
+        bus_features = [f for f in route_features if (f.get('properties') or {}).get('MODE') == 'Bus']
+        geometries = shapely.from_geojson([
+            orjson.dumps(f['geometry']) if f.get('geometry') else None for f in bus_features
+        ])
+        
+        gdf_routes = gpd.GeoDataFrame({
+            'Route No': pd.Series([f['properties'].get('ROUTENUMBER') for f in bus_features], dtype=object).astype(str),
+            'geometry': geometries,
+        }, geometry='geometry', crs="EPSG:4326")
         
         print(f"✅ Successfully fetched {len(gdf_routes)} bus route geometries.")
         return gdf_routes
@@ -289,32 +539,36 @@ def fetch_stop_geometry() -> gpd.GeoDataFrame:
     
     out_fields = ['STOPID', 'STOPNAME', 'MODE']
     
-    # fetch_arcgis_geometry now returns the data in EPSG:2193 (NZTM2000)
-    gdf_stops = fetch_arcgis_geometry(ARCGIS_STOPS_URL, 'STOPID', out_fields, mode='json')
+    gdf_stops = load_cached_geometry(STOPS_CACHE_FILE, ARCGIS_STOPS_URL, max_age_s=STOPS_CACHE_MAX_AGE_S)
+    if gdf_stops is not None:
+        print(f"✅ Loaded bus stop geometry records from cache: {len(gdf_stops)}")
+    else:
+        # fetch_arcgis_geometry now returns the data in EPSG:2193 (NZTM2000)
+        gdf_stops = fetch_arcgis_geometry(ARCGIS_STOPS_URL, 'STOPID', out_fields, mode='json')
+        if not gdf_stops.empty:
+            save_cached_geometry(gdf_stops, STOPS_CACHE_FILE)
     
     if gdf_stops.empty:
         print("⚠️ Warning: Failed to retrieve bus stop data.")
         return gdf_stops
         
-    gdf_stops.columns = [col.upper() for col in gdf_stops.columns] # Normalize column names
-    gdf_stops = gdf_stops[gdf_stops['MODE'] == 'Bus'].copy()
+    # Normalize attribute column names (the active 'geometry' column must keep its name)
+    gdf_stops = gdf_stops.rename(columns={col: col.upper() for col in gdf_stops.columns if col != 'geometry'})
+    gdf_stops = gdf_stops[gdf_stops['MODE'] == 'Bus']
     
-    # Transform stops back to EPSG:4326 for consistency before analyze_and_aggregate
-    gdf_stops = gdf_stops.to_crs(epsg=4326)
-    
-    print(f"✅ Successfully fetched and aligned {len(gdf_stops)} bus stop geometries.")
+    # Stops stay in NZTM2000: analyze_and_aggregate works in TARGET_CRS, and to_crs skips
+    # an identical CRS, so no 2193 -> 4326 -> 2193 round trip is needed.
+    print(f"✅ Successfully fetched {len(gdf_stops)} bus stop geometries (already in {TARGET_CRS}).")
     return gdf_stops[['STOPID', 'geometry']]
 
 
 # --- 4. Spatial Analysis and Aggregation ---
 
-def analyze_and_aggregate(gdf_routes: gpd.GeoDataFrame, gdf_crime: gpd.GeoDataFrame, gdf_stops: gpd.GeoDataFrame):
+def analyze_and_aggregate(gdf_routes: gpd.GeoDataFrame, df_crime: pd.DataFrame, gdf_meshblocks: gpd.GeoDataFrame, gdf_stops: gpd.GeoDataFrame):
     """Performs spatial join using Polygon-Line Intersection and Polygon-Point Containment."""
     print("--- 4. Executing Spatial Analysis and Aggregation ---")
     
-    os.makedirs(OUTPUT_DIR, exist_ok=True) 
-    
-    if gdf_crime.empty:
+    if df_crime.empty:
         print("⚠️ Warning: Skipping spatial analysis due to no valid Auckland crime data.")
         min_date = 'N/A'
         max_date = 'N/A'
@@ -327,65 +581,87 @@ def analyze_and_aggregate(gdf_routes: gpd.GeoDataFrame, gdf_crime: gpd.GeoDataFr
     # Project Routes (LineString) to TARGET_CRS (NZTM2000)
     gdf_routes_proj = gdf_routes.to_crs(TARGET_CRS).reset_index(names=['route_geom_id']) 
     
-    # Project Stops (Point) to TARGET_CRS
+    # Project Stops (Point) to TARGET_CRS (a no-op for the NZTM2000 stop service)
     gdf_stops_proj = gdf_stops.to_crs(TARGET_CRS)
     
-    # Project Crime (Polygon) to TARGET_CRS
-    if gdf_crime.crs is None or gdf_crime.crs != "EPSG:4326":
-        gdf_crime.set_crs(epsg=4326, inplace=True)
-        
-    gdf_crime_proj = gdf_crime.to_crs(TARGET_CRS).reset_index(names=['crime_data_id'])
-    print(f"   -> Successfully aligned CRS for all datasets to {TARGET_CRS}.")
+    # Every crime in a Meshblock shares its polygon, so collapse incidents to counts per
+    # (Meshblock, CrimeMonth, OffenceType) and only run the spatial joins on unique Meshblocks.
+    crime_grouped = df_crime.groupby(['Meshblock', 'CrimeMonth', 'OffenceType'], dropna=False, observed=True).size().reset_index(name='n')
+    # Month label for the trend breakdown, derived once here before rows fan out to routes
+    crime_grouped['Period'] = crime_grouped['CrimeMonth'].dt.to_period('M').astype(str)
+    
+    # Attach geometry only to the unique Meshblocks that have crimes. They are requested with
+    # outSR=TARGET_CRS, so a page without a spatialReference still holds NZTM2000 coordinates.
+    if gdf_meshblocks.crs is None:
+        gdf_meshblocks = gdf_meshblocks.set_crs(TARGET_CRS)
+    
+    gdf_mb = gdf_meshblocks[gdf_meshblocks['MB_number'].isin(crime_grouped['Meshblock'].unique())]
+    gdf_mb = gdf_mb.drop_duplicates(subset=['MB_number']).rename(columns={'MB_number': 'Meshblock'})
+    # Meshblocks are fetched in TARGET_CRS, so this only reprojects caches written in another CRS
+    gdf_mb_proj = gdf_mb[['Meshblock', 'geometry']].to_crs(TARGET_CRS)
+    print(f"   -> Successfully aligned CRS for all datasets to {TARGET_CRS} ({len(gdf_mb_proj)} unique Meshblocks).")
     
     # -------------------------------------------------------------------------
-    # 2. Association Method 1: Crime Polygon intersects Route Line
+    # 2. Association Method 1: Meshblock Polygon intersects Route Line
     # -------------------------------------------------------------------------
     print("   -> 2.1 Performing Line-Polygon intersection join...")
     
-    line_join = gpd.sjoin(
-        gdf_crime_proj[['crime_data_id', 'Meshblock', 'geometry']], 
-        gdf_routes_proj[['Route No', 'route_geom_id', 'geometry']], 
-        how='inner', 
-        predicate='intersects'
-    )
+    # Query a Shapely STRtree directly: it returns (meshblock, route) index pairs, which is all
+    # the aggregation needs, without sjoin's GeoDataFrame assembly around them.
+    mb_geoms = gdf_mb_proj.geometry.values
+    mb_ids = gdf_mb_proj['Meshblock'].to_numpy()
+    
+    # Routes and stops whose envelopes miss the box around the crime Meshblocks can never match, so they
+    # are dropped by comparing bounds arrays before the trees are built (the regional layers reach past Auckland)
+    mb_box = gdf_mb_proj.total_bounds
+    routes_cand = gdf_routes_proj[bounds_overlap(gdf_routes_proj.geometry.values, mb_box)]
+    stops_cand = gdf_stops_proj[bounds_overlap(gdf_stops_proj.geometry.values, mb_box)]
+    
+    route_tree = shapely.STRtree(routes_cand.geometry.values)
+    mb_idx, route_idx = route_tree.query(mb_geoms, predicate='intersects')
+    # Order pairs by (Meshblock, route_geom_id). When two lines share a Route No, the (Meshblock, Route No)
+    # dedup below credits the Meshblock to the lower route_geom_id. gpd.sjoin kept tree-traversal order
+    # instead, so the per-line split of such a route's crimes can differ from that older output.
+    pair_order = np.lexsort((route_idx, mb_idx))
+    mb_idx, route_idx = mb_idx[pair_order], route_idx[pair_order]
+    
+    line_join = pd.DataFrame({
+        'Meshblock': mb_ids[mb_idx],
+        'route_geom_id': routes_cand['route_geom_id'].to_numpy()[route_idx],
+        # Categorical, so the (Meshblock, Route No) dedups below hash int codes rather than strings
+        'Route No': routes_cand['Route No'].astype('category').array[route_idx],
+    })
     
     # -------------------------------------------------------------------------
-    # 3. Association Method 2: Crime Polygon contains Bus Stop Point
+    # 3. Association Method 2: Meshblock Polygon contains Bus Stop Point
     # -------------------------------------------------------------------------
     
-    # Join crime polygons (left) with bus stop points (right)
+    # Query Meshblock polygons (input) against bus stop points (tree)
     print("   -> 2.2 Performing Polygon-Point containment join (Meshblock contains Stop)...")
-    stop_join = gpd.sjoin(
-        gdf_crime_proj[['crime_data_id', 'Meshblock', 'geometry']],
-        gdf_stops_proj[['STOPID', 'geometry']],
-        how='inner',
-        predicate='contains'
-    )
+    stop_tree = shapely.STRtree(stops_cand.geometry.values)
+    mb_with_stop_idx, _ = stop_tree.query(mb_geoms, predicate='contains')
 
     # Find all unique Meshblocks that contain a stop AND have a crime
-    crime_meshblocks_with_stops = stop_join[['Meshblock']].drop_duplicates()
+    crime_meshblocks_with_stops = pd.DataFrame({'Meshblock': mb_ids[np.unique(mb_with_stop_idx)]})
     
     # Identify which routes pass through these Meshblocks (using the initial line_join)
-    stop_route_join = line_join[['crime_data_id', 'Meshblock', 'route_geom_id', 'Route No']].merge(
+    stop_route_join = line_join[['Meshblock', 'route_geom_id', 'Route No']].merge(
         crime_meshblocks_with_stops, 
         on='Meshblock', 
         how='inner'
-    ).drop_duplicates(subset=['crime_data_id', 'Route No'])
+    ).drop_duplicates(subset=['Meshblock', 'Route No'])
     
     # -------------------------------------------------------------------------
     # 4. Combine and Aggregate Results
     # -------------------------------------------------------------------------
     
-    # Combine results from both methods
-    line_join = line_join[['crime_data_id', 'Meshblock', 'route_geom_id', 'Route No']].drop_duplicates()
+    # Combine results from both methods (STRtree pairs are already unique, so line_join needs no dedup of its own)
+    combined_mb_routes = pd.concat([line_join, stop_route_join]).drop_duplicates(subset=['Meshblock', 'Route No'])
     
-    combined_crime_routes = pd.concat([line_join, stop_route_join]).drop_duplicates(subset=['crime_data_id', 'Route No'])
+    # Fan the grouped crime counts out to the routes of their Meshblock; 'n' carries the incident weight
+    crime_counts = combined_mb_routes.merge(crime_grouped, on='Meshblock', how='inner')
     
-    print(f"   -> Final unique Crime-Route associations: {len(combined_crime_routes)}") 
-    
-    # Merge crime data attributes back to the combined association table
-    crime_data_attributes = gdf_crime_proj.drop(columns=['geometry']).set_index('crime_data_id')[['OffenceType', 'CrimeMonth']].copy()
-    crime_counts = combined_crime_routes.merge(crime_data_attributes, left_on='crime_data_id', right_index=True, how='left')
+    print(f"   -> Final unique Crime-Route associations: {int(crime_counts['n'].sum())}") 
 
     if crime_counts.empty:
         print("❌ CRITICAL: The spatial join returned zero records after both Line and Stop checks.")
@@ -406,7 +682,7 @@ def analyze_and_aggregate(gdf_routes: gpd.GeoDataFrame, gdf_crime: gpd.GeoDataFr
             max_date = 'N/A (All dates invalid)'
 
     # 5. Aggregate total crime per route (using 'route_geom_id')
-    total_crime_summary = crime_counts.groupby('route_geom_id').size().reset_index(name='Total_Crime_Count')
+    total_crime_summary = crime_counts.groupby('route_geom_id')['n'].sum().astype('int32')
     
     # 6. Aggregate crime details (trend and type)
     crime_details = {
@@ -419,37 +695,41 @@ def analyze_and_aggregate(gdf_routes: gpd.GeoDataFrame, gdf_crime: gpd.GeoDataFr
         'routes': {}
     }
     
-    for route_id in total_crime_summary['route_geom_id'].unique():
-        route_data = crime_counts[crime_counts['route_geom_id'] == route_id]
-        route_no = gdf_routes_proj[gdf_routes_proj['route_geom_id'] == route_id]['Route No'].iloc[0]
-        
-        valid_dates = route_data.dropna(subset=['CrimeMonth'])
-        monthly_trend = valid_dates.groupby(valid_dates['CrimeMonth'].dt.to_period('M')).size().to_dict()
-        monthly_trend = {str(k): int(v) for k, v in monthly_trend.items()}
-        
-        type_breakdown = route_data['OffenceType'].value_counts().to_dict()
-        type_breakdown = {k: int(v) for k, v in type_breakdown.items()}
+    # Both breakdowns are pivoted once over all routes rather than re-filtering crime_counts per route
+    route_ids = total_crime_summary.index
+    monthly = crime_counts.dropna(subset=['CrimeMonth']).pivot_table(
+        index='route_geom_id', columns='Period', values='n', aggfunc='sum', fill_value=0, observed=True
+    )
+    types = crime_counts.pivot_table(index='route_geom_id', columns='OffenceType', values='n', aggfunc='sum', fill_value=0, observed=True)
+    monthly = monthly.reindex(route_ids, fill_value=0)
+    types = types.reindex(route_ids, fill_value=0)
+    
+    route_no_map = dict(zip(gdf_routes_proj['route_geom_id'], gdf_routes_proj['Route No']))
+    
+    for route_id in route_ids:
+        trend_row = monthly.loc[route_id]
+        type_row = types.loc[route_id].sort_values(ascending=False)
         
-        crime_details['routes'][route_no] = {
-            'monthly_trend': monthly_trend,
-            'type_breakdown': type_breakdown
+        crime_details['routes'][route_no_map[route_id]] = {
+            'monthly_trend': dict(trend_row[trend_row > 0].items()),
+            'type_breakdown': dict(type_row[type_row > 0].items())
         }
 
-    # 7. Merge total crime count back to route GeoDataFrame
-    gdf_results = gdf_routes_proj.merge(total_crime_summary, 
-                                        on='route_geom_id', 
-                                        how='left')
-    gdf_results['Total_Crime_Count'] = gdf_results['Total_Crime_Count'].fillna(0).astype(int)
-    
-    # Final output CRS should be EPSG:4326 for web display
-    gdf_output = gdf_results.to_crs(epsg=4326)[['Route No', 'Total_Crime_Count', 'geometry']].copy()
+    # 7. Attach total crime count to the route GeoDataFrame
+    # Final output CRS should be EPSG:4326 for web display: reuse the fetched WGS84 lines rather than
+    # projecting the 2193 copy back. Their index is route_geom_id, so a reindex aligns the totals.
+    gdf_output = gdf_routes[['Route No', 'geometry']]
+    if gdf_output.crs != 'EPSG:4326':
+        gdf_output = gdf_output.to_crs(epsg=4326)
+    gdf_output = gdf_output.assign(Total_Crime_Count=total_crime_summary.reindex(gdf_output.index, fill_value=0).to_numpy())
+    gdf_output = gdf_output[['Route No', 'Total_Crime_Count', 'geometry']]
 
     # 8. Save results
-    gdf_output.to_file(OUTPUT_FILE, driver='GeoJSON', encoding='utf-8')
+    # pyogrio hands the whole frame to GDAL in one call instead of writing feature by feature
+    pyogrio.write_dataframe(gdf_output, OUTPUT_FILE, driver='GeoJSON', encoding='utf-8')
     print(f"✅ GeoJSON output to {OUTPUT_FILE}")
     
-    with open(STATS_OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(crime_details, f, ensure_ascii=False, indent=4)
+    write_stats_output(crime_details)
     print(f"✅ Crime breakdown statistics output to {STATS_OUTPUT_FILE}")
 
 def empty_geojson_output(gdf_routes):
@@ -457,9 +737,9 @@ def empty_geojson_output(gdf_routes):
     if gdf_routes.crs != 'EPSG:4326':
         gdf_routes = gdf_routes.to_crs(epsg=4326)
         
-    gdf_routes['Total_Crime_Count'] = 0
-    gdf_routes = gdf_routes[['Route No', 'Total_Crime_Count', 'geometry']].copy()
-    gdf_routes.to_file(OUTPUT_FILE, driver='GeoJSON', encoding='utf-8')
+    # Column selection already yields a new frame, so the caller's routes are left untouched
+    gdf_routes = gdf_routes[['Route No', 'geometry']].assign(Total_Crime_Count=0)[['Route No', 'Total_Crime_Count', 'geometry']]
+    pyogrio.write_dataframe(gdf_routes, OUTPUT_FILE, driver='GeoJSON', encoding='utf-8')
 
 def empty_stats_output(min_date, max_date):
     crime_details = {
@@ -471,31 +751,40 @@ def empty_stats_output(min_date, max_date):
         },
         'routes': {}
     }
-    with open(STATS_OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(crime_details, f, ensure_ascii=False, indent=4)
+    write_stats_output(crime_details)
+
+def write_stats_output(crime_details):
+    # orjson serializes straight to UTF-8 bytes (non-ASCII kept as-is, like ensure_ascii=False),
+    # including the numpy counts taken from the pivot tables
+    with open(STATS_OUTPUT_FILE, 'wb') as f:
+        f.write(orjson.dumps(crime_details, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY))
 
 
 # --- 5. Main Flow ---
 def run_etl():
     """Runs the ETL pipeline."""
-    if not POLICE_DATA_URL:
-        print("❌ Error: POLICE_DATA_URL environment variable is missing. Please set it in GitHub Secrets.")
-        sys.exit(1)
-        
     try:
+        # The only place OUTPUT_DIR is created; the output writers assume it exists
         os.makedirs(OUTPUT_DIR, exist_ok=True)
         
-        # 1. Fetch Crime (Polygons)
-        gdf_crime = fetch_and_clean_police_data(POLICE_DATA_URL, MESHBLOCK_BASE_URL) 
-        
-        # 2. Fetch Route Lines
-        gdf_routes = fetch_route_geometry()
-        
-        # 3. Fetch Bus Stops (Points)
-        gdf_stops = fetch_stop_geometry()
+        # Stages 1-3 hit independent services and are network-bound, so they run concurrently
+        # (their progress output interleaves); results are joined before the analysis.
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            # 1. Fetch Crime (attributes) and Meshblock Polygons
+            crime_future = executor.submit(fetch_and_clean_police_data, POLICE_DATA_URL, MESHBLOCK_BASE_URL)
+            
+            # 2. Fetch Route Lines
+            routes_future = executor.submit(fetch_route_geometry)
+            
+            # 3. Fetch Bus Stops (Points)
+            stops_future = executor.submit(fetch_stop_geometry)
+            
+            df_crime, gdf_meshblocks = crime_future.result()
+            gdf_routes = routes_future.result()
+            gdf_stops = stops_future.result()
         
         # 4. Analyze
-        analyze_and_aggregate(gdf_routes, gdf_crime, gdf_stops)
+        analyze_and_aggregate(gdf_routes, df_crime, gdf_meshblocks, gdf_stops)
         print("\n🎉 ETL pipeline completed successfully!")
     except Exception as e:
         error_message = str(e).strip()